@@ -1,19 +1,33 @@
 # main.py
 import os
-from fastapi import FastAPI, UploadFile, File
+import json
+from fastapi import FastAPI, UploadFile, File, Header
+from fastapi.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, StreamingResponse
 from pydantic import BaseModel
 from pathlib import Path
 from typing import Optional
 from contextlib import asynccontextmanager
+import socket
 import traceback
 import logging
+from urllib.error import URLError
+from groq import APITimeoutError
 
 # Import your modules (make sure these functions exist)
-from src.ingest import ingest_documents, store_documents
-from src.retrieve import retrieve_context
+from src.ingest import ingest_documents, store_documents, delete_document
+from src.retrieve import retrieve_chunks
 from src.summary import answer_from_sources
+from src.summarize import summarize_document
+from src.rerank import warm_up as warm_up_reranker
 from src.arxiv_search import search_arxiv
+from src.shards import rebalance
+from src.embedding_cache import get_embeddings
+from src.dedup import get_signature_index
+from src.admission import (
+    AdmissionController, Deadline, DeadlineExceeded, Overloaded, CHAT_DEADLINE_S, BATCH, INTERACTIVE
+)
 from src.utils import extract_text_from_pdf  # your PDF text extractor
 
 # Logging
@@ -35,11 +49,18 @@ async def lifespan(app: FastAPI):
         logger.info("✅ Auto-ingest complete: %s", result)
     except Exception as e:
         logger.exception("❌ Auto-ingest failed at startup: %s", e)
+    try:
+        warm_up_reranker()
+    except Exception as e:
+        logger.exception("❌ Reranker failed to load; bi-encoder order will be used: %s", e)
     yield
     logger.info("🛑 FastAPI shutting down...")
 
 app = FastAPI(title="Research Assistant API", version="1.0", lifespan=lifespan)
 
+# Bounded admission for the expensive /chat pipeline (see src/admission.py)
+chat_admission = AdmissionController()
+
 # CORS for frontend support (React / Streamlit / anything)
 app.add_middleware(
     CORSMiddleware,
@@ -56,6 +77,12 @@ app.add_middleware(
 class QueryRequest(BaseModel):
     question: str
     k: Optional[int] = 10        # number of vector results to fetch (optional)
+    tenant: Optional[str] = None # search only this tenant's documents (optional)
+    timeout_s: Optional[float] = None  # request deadline in seconds (default and maximum CHAT_DEADLINE_S)
+    rerank: Optional[bool] = None      # override RERANK_ENABLED for this request (optional)
+
+class SummarizeRequest(BaseModel):
+    filepath: str                # path of an ingested document (as returned by /upload-pdf)
 
 # ---------------------------
 # ROUTES
@@ -68,9 +95,10 @@ def home():
 
 # --------- 1) Upload single PDF and ingest that file only ---------
 @app.post("/upload-pdf")
-async def upload_pdf(file: Optional[UploadFile] = File(None)):
+async def upload_pdf(file: Optional[UploadFile] = File(None), tenant: Optional[str] = None):
     """
     Save uploaded PDF into data/uploaded_papers and ingest it immediately (only this file).
+    An optional ?tenant= routes the document to that tenant's shard.
     Returns the file path and ingest result.
     """
     if file is None:
@@ -94,7 +122,7 @@ async def upload_pdf(file: Optional[UploadFile] = File(None)):
             logger.warning("%s for file %s", msg, file_path)
             return {"status": "skipped", "message": msg, "filepath": str(file_path)}
 
-        ingest_result = store_documents(str(file_path), text)
+        ingest_result = store_documents(str(file_path), text, tenant=tenant)
         logger.info("Ingest result for %s: %s", file_path, ingest_result)
 
         return {"status": "success", "filepath": str(file_path), "ingest": ingest_result}
@@ -119,35 +147,157 @@ def index_all_data():
         return {"status": "error", "message": str(e), "trace": traceback.format_exc()}
 
 
+# --------- 2b) Remove a document from the index ---------
+@app.delete("/documents")
+def remove_document(filepath: str):
+    """
+    Drop a document's chunks from the vector index and the chunk store.
+    The chunk store compacts itself once enough text is dead.
+    """
+    try:
+        return delete_document(filepath)
+    except Exception as e:
+        logger.exception("Delete failed for %s: %s", filepath, e)
+        return {"status": "error", "message": str(e), "trace": traceback.format_exc()}
+
+
+# --------- 2c) Rebalance shards ---------
+@app.post("/rebalance")
+def rebalance_shards():
+    """
+    Move documents onto the shard their routing key maps to under the
+    current SHARD_COUNT. Run after adding shards.
+    """
+    try:
+        return rebalance()
+    except Exception as e:
+        logger.exception("Rebalance failed: %s", e)
+        return {"status": "error", "message": str(e), "trace": traceback.format_exc()}
+
+
+# --------- 2d) Embedding cache statistics ---------
+@app.get("/embedding-cache")
+def embedding_cache_stats():
+    """Hit rates, entry counts and bytes used by the embedding cache."""
+    return get_embeddings().cache.snapshot()
+
+
 # --------- 3) Chat / Answer Query ---------
+def _answer(request: QueryRequest, deadline: Deadline):
+    query = request.question
+    k = request.k or 10
+
+    # Retrieve context from vector DB (do not re-ingest here), optionally reranked
+    chunks, retrieval = retrieve_chunks(
+        query, k=k, tenant=request.tenant, deadline=deadline, use_rerank=request.rerank
+    )
+    context = "\n".join(chunks)
+
+    # Get arXiv papers as fallback / supplement
+    # Client-side timeouts count as the deadline running out (→ 503), not as errors
+    try:
+        papers = search_arxiv(query, max_results=6, timeout=deadline.budget("arxiv"))
+    except (socket.timeout, TimeoutError) as e:
+        raise DeadlineExceeded("arxiv") from e
+    except URLError as e:
+        if isinstance(e.reason, (socket.timeout, TimeoutError)):
+            raise DeadlineExceeded("arxiv") from e
+        raise
+
+    # Generate grounded answer using both sources (internal logic decides priority)
+    try:
+        answer = answer_from_sources(query, context, papers, deadline=deadline)
+    except APITimeoutError as e:
+        raise DeadlineExceeded("llm") from e
+
+    return {
+        "status": "ok",
+        "answer": answer,
+        "db_chunks": context,
+        "papers": papers,
+        "retrieval": retrieval,
+    }
+
+
 @app.post("/chat")
-def chat(request: QueryRequest):
+async def chat(request: QueryRequest, x_request_priority: Optional[str] = Header(None)):
     """
     Query the system:
-    - retrieve_context(query, k=request.k) returns the vector DB chunks (string or list)
+    - retrieve_chunks(query, k=request.k) returns the vector DB chunks (optionally reranked)
     - search_arxiv(query) returns a list of arXiv paper dicts
     - answer_from_sources(query, context, papers) returns the final LLM answer
+
+    Admission: the request waits for a pipeline slot without holding a worker
+    thread. "X-Request-Priority: interactive" (the UI) is served before batch
+    callers. Full queue → 429, deadline passed → 503, both with Retry-After.
     """
     query = request.question
-    k = request.k or 10
+    deadline = Deadline(min(request.timeout_s or CHAT_DEADLINE_S, CHAT_DEADLINE_S))
+    priority = INTERACTIVE if x_request_priority == INTERACTIVE else BATCH
 
     try:
-        # Retrieve context from vector DB (do not re-ingest here)
-        context = retrieve_context(query, k=k)
+        async with chat_admission.slot(priority, deadline):
+            return await run_in_threadpool(_answer, request, deadline)
+
+    except Overloaded as e:
+        logger.warning("Shedding %s chat request: %s", priority, chat_admission.snapshot())
+        return JSONResponse(
+            status_code=429,
+            content={"status": "rejected", "message": str(e)},
+            headers={"Retry-After": str(e.retry_after)},
+        )
+    except DeadlineExceeded as e:
+        logger.warning("Chat deadline exceeded at stage '%s' for query '%s'", e.stage, query)
+        return JSONResponse(
+            status_code=503,
+            content={"status": "timeout", "message": str(e)},
+            headers={"Retry-After": str(max(e.retry_after, chat_admission.retry_after()))},
+        )
+    except Exception as e:
+        logger.exception("Chat failed for query '%s': %s", query, e)
+        return {"status": "error", "message": str(e), "trace": traceback.format_exc()}
 
-        # Get arXiv papers as fallback / supplement
-        papers = search_arxiv(query, max_results=6)
 
-        # Generate grounded answer using both sources (internal logic decides priority)
-        answer = answer_from_sources(query, context, papers)
+@app.get("/chat/admission")
+def chat_admission_stats():
+    """Current load on the /chat pipeline (active, queued, shed counts)."""
+    return chat_admission.snapshot()
 
-        return {
-            "status": "ok",
-            "answer": answer,
-            "db_chunks": context,
-            "papers": papers,
-        }
 
+# --------- 4) Summarize a full ingested document ---------
+@app.post("/summarize")
+def summarize(request: SummarizeRequest):
+    """
+    Map-reduce summary of a whole ingested document (internal files under data/
+    such as the chunk store or embedding cache are not accepted).
+    Streams newline-delimited JSON progress events; the last one is
+    {"event": "done", "summary": ...} (or {"event": "error", ...}).
+    """
+    data_root = (ROOT / "data").resolve()
+    file_path = Path(request.filepath)
+    if not file_path.is_absolute():
+        file_path = ROOT / file_path
+    file_path = file_path.resolve()
+
+    ingested = get_signature_index().document(str(file_path)) is not None
+    if data_root not in file_path.parents or not file_path.is_file() or not ingested:
+        return {"status": "error", "message": f"Not an ingested document: {request.filepath}"}
+
+    try:
+        if file_path.suffix.lower() == ".pdf":
+            text = extract_text_from_pdf(str(file_path))
+        else:
+            text = file_path.read_text(encoding="utf-8")
     except Exception as e:
-        logger.exception("Chat failed for query '%s': %s", query, e)
+        logger.exception("Failed to read %s for summarization: %s", file_path, e)
         return {"status": "error", "message": str(e), "trace": traceback.format_exc()}
+
+    def event_stream():
+        try:
+            for event in summarize_document(text):
+                yield json.dumps(event) + "\n"
+        except Exception as e:
+            logger.exception("Summarization failed for %s: %s", file_path, e)
+            yield json.dumps({"event": "error", "message": str(e)}) + "\n"
+
+    return StreamingResponse(event_stream(), media_type="application/x-ndjson")
@@ -0,0 +1,144 @@
+# src/admission.py
+"""
+Admission control for the expensive /chat pipeline (retrieve → arXiv → LLM).
+
+- At most max_concurrent requests run the pipeline; the rest wait in a bounded
+  queue on the event loop (no worker thread is held while waiting).
+- Interactive (UI) requests are always dequeued before batch requests, and batch
+  callers get only part of the queue.
+- Every request carries a Deadline; each stage checks it and stops further work
+  once it has passed.
+- A full queue raises Overloaded (→ 429), a deadline that expires while queued or
+  mid-pipeline raises DeadlineExceeded (→ 503); both carry a Retry-After hint.
+"""
+import asyncio
+import math
+import os
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+
+# ------------ CONFIG ------------
+CHAT_MAX_CONCURRENCY = int(os.getenv("CHAT_MAX_CONCURRENCY", "4"))
+CHAT_MAX_QUEUE = int(os.getenv("CHAT_MAX_QUEUE", "16"))
+CHAT_DEADLINE_S = float(os.getenv("CHAT_DEADLINE_S", "60"))
+BATCH_QUEUE_SHARE = 0.5       # batch callers may fill at most this share of the queue
+
+INTERACTIVE = "interactive"
+BATCH = "batch"
+
+
+class DeadlineExceeded(Exception):
+    def __init__(self, stage: str, retry_after: int = 1):
+        super().__init__(f"Deadline exceeded before stage '{stage}'")
+        self.stage = stage
+        self.retry_after = retry_after
+
+
+class Overloaded(Exception):
+    def __init__(self, retry_after: int):
+        super().__init__("Server is busy; request queue is full")
+        self.retry_after = retry_after
+
+
+class Deadline:
+    def __init__(self, seconds: float):
+        self.expires_at = time.monotonic() + seconds
+
+    def remaining(self) -> float:
+        return max(0.0, self.expires_at - time.monotonic())
+
+    def expired(self) -> bool:
+        return time.monotonic() >= self.expires_at
+
+    def check(self, stage: str):
+        """Raise DeadlineExceeded if there is no time left to start `stage`."""
+        if self.expired():
+            raise DeadlineExceeded(stage)
+
+    def budget(self, stage: str) -> float:
+        """Seconds left to spend on `stage` (never 0); raise DeadlineExceeded if none are left."""
+        remaining = self.remaining()
+        if remaining <= 0:
+            raise DeadlineExceeded(stage)
+        return remaining
+
+
+class AdmissionController:
+    def __init__(self, max_concurrent: int = CHAT_MAX_CONCURRENCY, max_queue: int = CHAT_MAX_QUEUE):
+        self.max_concurrent = max_concurrent
+        self.max_queue = max_queue
+        self.active = 0
+        self.lanes = {INTERACTIVE: deque(), BATCH: deque()}
+        self.service_time = 5.0   # EWMA of seconds per admitted request
+        self.stats = {"admitted": 0, "rejected": 0, "expired_in_queue": 0}
+
+    def queued(self) -> int:
+        return sum(len(lane) for lane in self.lanes.values())
+
+    def retry_after(self) -> int:
+        """Rough seconds until a new request would get a slot."""
+        waves = (self.queued() + 1) / self.max_concurrent
+        return max(1, math.ceil(waves * self.service_time))
+
+    async def acquire(self, priority: str, deadline: Deadline):
+        if self.active < self.max_concurrent and not self.queued():
+            self.active += 1
+            self.stats["admitted"] += 1
+            return
+
+        limit = self.max_queue if priority == INTERACTIVE else int(self.max_queue * BATCH_QUEUE_SHARE)
+        if self.queued() >= limit:
+            self.stats["rejected"] += 1
+            raise Overloaded(self.retry_after())
+
+        lane = self.lanes[INTERACTIVE if priority == INTERACTIVE else BATCH]
+        fut = asyncio.get_running_loop().create_future()
+        lane.append(fut)
+        try:
+            await asyncio.wait_for(asyncio.shield(fut), timeout=deadline.remaining())
+        except (asyncio.TimeoutError, asyncio.CancelledError) as e:
+            # timed out, or the waiting task was cancelled (client gone, shutdown)
+            if fut.done() and not fut.cancelled():
+                # slot was handed over just as we gave up: give it back
+                self.release()
+            else:
+                fut.cancel()
+                if fut in lane:
+                    lane.remove(fut)
+            if isinstance(e, asyncio.CancelledError):
+                raise
+            self.stats["expired_in_queue"] += 1
+            raise DeadlineExceeded("queue", self.retry_after())
+        self.stats["admitted"] += 1
+
+    def release(self):
+        """Hand the slot to the next waiter (interactive first) or free it."""
+        for lane in (self.lanes[INTERACTIVE], self.lanes[BATCH]):
+            while lane:
+                fut = lane.popleft()
+                if not fut.done():
+                    fut.set_result(None)
+                    return
+        self.active -= 1
+
+    @asynccontextmanager
+    async def slot(self, priority: str, deadline: Deadline):
+        await self.acquire(priority, deadline)
+        started = time.monotonic()
+        try:
+            yield
+        finally:
+            self.service_time = 0.8 * self.service_time + 0.2 * (time.monotonic() - started)
+            self.release()
+
+    def snapshot(self) -> dict:
+        return {
+            **self.stats,
+            "active": self.active,
+            "queued_interactive": len(self.lanes[INTERACTIVE]),
+            "queued_batch": len(self.lanes[BATCH]),
+            "max_concurrent": self.max_concurrent,
+            "max_queue": self.max_queue,
+            "avg_service_s": round(self.service_time, 2),
+        }
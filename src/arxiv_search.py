@@ -1,7 +1,7 @@
 import urllib.request, urllib.parse
 from urllib.parse import urlparse
 from defusedxml.ElementTree import fromstring
-from typing import List, Dict
+from typing import List, Dict, Optional
 import re
 
 
@@ -106,7 +106,7 @@ def parse_arxiv_atom(xml_text: str) -> List[Dict]:
 # -------------------------------------------------
 # 3. Main search function
 # -------------------------------------------------
-def search_arxiv(topic: str, max_results: int = 8) -> List[Dict]:
+def search_arxiv(topic: str, max_results: int = 8, timeout: Optional[float] = None) -> List[Dict]:
     from urllib.parse import urlencode
 
     structured_query = preprocess_query(topic)
@@ -121,7 +121,7 @@ def search_arxiv(topic: str, max_results: int = 8) -> List[Dict]:
 
     url = ARXIV_API_URL + urlencode(params)
 
-    resp = urllib.request.urlopen(url)
+    resp = urllib.request.urlopen(url, timeout=timeout)
     xml_text = resp.read().decode("utf-8")
 
     return parse_arxiv_atom(xml_text)
\ No newline at end of file
@@ -0,0 +1,285 @@
+# src/chunk_store.py
+"""
+Append-only, block-compressed chunk text store on local disk.
+
+The vector index only keeps integer chunk IDs; the text lives here and is
+fetched in bulk for the final chunks of a query.
+
+Files (under CHUNK_STORE_DIR):
+  chunks.dat   zlib-compressed blocks, each a JSON list of chunk texts (read via mmap)
+  blocks.idx   one record per block: (offset u64, length u32)
+  chunks.idx   one record per chunk ID: (block u32, slot u16)
+               slot has the TOMBSTONE bit once deleted; block is DELETED once compacted away
+  docs.json    source document -> list of chunk IDs
+  store.id     random ID of this store; vector index rows are "<store id>:<chunk id>"
+               so rows written by another (or a lost) store never resolve here
+"""
+import json
+import mmap
+import os
+import re
+import struct
+import threading
+import uuid
+import zlib
+from array import array
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional
+
+# ------------ CONFIG ------------
+CHUNK_STORE_DIR = os.getenv("CHUNK_STORE_DIR", "data/chunk_store")
+BLOCK_CHUNKS = 32             # chunks per compressed block
+BLOCK_CACHE_SIZE = 256        # decoded blocks kept in the LRU
+COMPACT_DEAD_RATIO = 0.3      # auto-compact once this fraction of chunks is deleted
+
+BLOCK_REC = struct.Struct("<QI")
+CHUNK_REC = struct.Struct("<IH")
+DELETED = 0xFFFFFFFF
+TOMBSTONE = 0x8000
+VECTOR_ID_RE = re.compile(r"^[0-9a-f]{32}:\d+$")
+
+
+class ChunkStore:
+    def __init__(self, directory: str = CHUNK_STORE_DIR):
+        self.dir = Path(directory)
+        self.dir.mkdir(parents=True, exist_ok=True)
+        self.data_path = self.dir / "chunks.dat"
+        self.blocks_path = self.dir / "blocks.idx"
+        self.chunks_path = self.dir / "chunks.idx"
+        self.docs_path = self.dir / "docs.json"
+        self.id_path = self.dir / "store.id"
+
+        self._lock = threading.RLock()
+        self._cache: "OrderedDict[int, List[str]]" = OrderedDict()
+        self._mm: Optional[mmap.mmap] = None
+        self._data_fh = None
+        self._load()
+
+    # ------------ LOAD / PERSIST ------------
+    def _load(self):
+        for p in (self.data_path, self.blocks_path, self.chunks_path):
+            p.touch(exist_ok=True)
+        if not self.id_path.exists():
+            self.id_path.write_text(uuid.uuid4().hex, encoding="utf-8")
+        self.store_id = self.id_path.read_text(encoding="utf-8").strip()
+
+        self.block_offsets = array("Q")
+        self.block_lengths = array("I")
+        raw = self.blocks_path.read_bytes()
+        for off, length in BLOCK_REC.iter_unpack(raw[: len(raw) - len(raw) % BLOCK_REC.size]):
+            self.block_offsets.append(off)
+            self.block_lengths.append(length)
+
+        self.chunk_blocks = array("I")
+        self.chunk_slots = array("H")
+        raw = self.chunks_path.read_bytes()
+        for block, slot in CHUNK_REC.iter_unpack(raw[: len(raw) - len(raw) % CHUNK_REC.size]):
+            self.chunk_blocks.append(block)
+            self.chunk_slots.append(slot)
+
+        # chunks physically in chunks.dat, and how many of those are tombstoned
+        self._stored = self._dead = 0
+        for block, slot in zip(self.chunk_blocks, self.chunk_slots):
+            if block != DELETED:
+                self._stored += 1
+                self._dead += bool(slot & TOMBSTONE)
+
+        self.docs: Dict[str, List[int]] = {}
+        if self.docs_path.exists():
+            self.docs = json.loads(self.docs_path.read_text(encoding="utf-8"))
+
+        self._remap()
+
+    def _remap(self):
+        if self._mm is not None:
+            self._mm.close()
+            self._mm = None
+        if self._data_fh is not None:
+            self._data_fh.close()
+            self._data_fh = None
+        if self.data_path.stat().st_size > 0:
+            self._data_fh = open(self.data_path, "rb")
+            self._mm = mmap.mmap(self._data_fh.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def _save_docs(self):
+        tmp = self.docs_path.with_suffix(".tmp")
+        tmp.write_text(json.dumps(self.docs), encoding="utf-8")
+        os.replace(tmp, self.docs_path)
+
+    def close(self):
+        with self._lock:
+            if self._mm is not None:
+                self._mm.close()
+                self._mm = None
+            if self._data_fh is not None:
+                self._data_fh.close()
+                self._data_fh = None
+
+    # ------------ WRITE ------------
+    def append(self, texts: List[str], source: str) -> List[int]:
+        """Append the chunks of one document; returns their new chunk IDs."""
+        with self._lock:
+            ids: List[int] = []
+            block_recs = bytearray()
+            chunk_recs = bytearray()
+            offset = self.data_path.stat().st_size
+
+            with open(self.data_path, "ab") as data:
+                for start in range(0, len(texts), BLOCK_CHUNKS):
+                    batch = texts[start:start + BLOCK_CHUNKS]
+                    payload = zlib.compress(json.dumps(batch).encode("utf-8"))
+                    data.write(payload)
+
+                    block_no = len(self.block_offsets)
+                    self.block_offsets.append(offset)
+                    self.block_lengths.append(len(payload))
+                    block_recs += BLOCK_REC.pack(offset, len(payload))
+                    offset += len(payload)
+
+                    for slot in range(len(batch)):
+                        ids.append(len(self.chunk_blocks))
+                        self.chunk_blocks.append(block_no)
+                        self.chunk_slots.append(slot)
+                        chunk_recs += CHUNK_REC.pack(block_no, slot)
+
+            with open(self.blocks_path, "ab") as f:
+                f.write(block_recs)
+            with open(self.chunks_path, "ab") as f:
+                f.write(chunk_recs)
+
+            self.docs.setdefault(source, []).extend(ids)
+            self._stored += len(ids)
+            self._save_docs()
+            self._remap()
+            return ids
+
+    def delete_document(self, source: str) -> List[int]:
+        """Tombstone every chunk of a document; returns the removed IDs."""
+        with self._lock:
+            ids = self.docs.pop(source, [])
+            if not ids:
+                return []
+            with open(self.chunks_path, "r+b") as f:
+                for cid in ids:
+                    self.chunk_slots[cid] |= TOMBSTONE
+                    f.seek(cid * CHUNK_REC.size)
+                    f.write(CHUNK_REC.pack(self.chunk_blocks[cid], self.chunk_slots[cid]))
+            self._dead += len(ids)
+            self._save_docs()
+
+            if self.dead_ratio() >= COMPACT_DEAD_RATIO:
+                self.compact()
+            return ids
+
+    def compact(self) -> dict:
+        """
+        Rewrite chunks.dat without deleted chunks. Chunk IDs are kept stable,
+        so the vector index does not need to change.
+        """
+        with self._lock:
+            before = self.data_path.stat().st_size
+            tmp_data = self.data_path.with_suffix(".dat.tmp")
+            new_offsets = array("Q")
+            new_lengths = array("I")
+            new_blocks = array("I", [DELETED]) * len(self.chunk_blocks)
+            new_slots = array("H", [0]) * len(self.chunk_blocks)
+
+            live = sorted(cid for ids in self.docs.values() for cid in ids)
+            offset = 0
+            with open(tmp_data, "wb") as data:
+                for start in range(0, len(live), BLOCK_CHUNKS):
+                    batch_ids = live[start:start + BLOCK_CHUNKS]
+                    payload = zlib.compress(json.dumps(self.get_many(batch_ids)).encode("utf-8"))
+                    data.write(payload)
+                    block_no = len(new_offsets)
+                    new_offsets.append(offset)
+                    new_lengths.append(len(payload))
+                    offset += len(payload)
+                    for slot, cid in enumerate(batch_ids):
+                        new_blocks[cid] = block_no
+                        new_slots[cid] = slot
+
+            tmp_blocks = self.blocks_path.with_suffix(".idx.tmp")
+            tmp_blocks.write_bytes(b"".join(BLOCK_REC.pack(o, n) for o, n in zip(new_offsets, new_lengths)))
+            tmp_chunks = self.chunks_path.with_suffix(".idx.tmp")
+            tmp_chunks.write_bytes(b"".join(CHUNK_REC.pack(b, s) for b, s in zip(new_blocks, new_slots)))
+
+            self.close()
+            os.replace(tmp_data, self.data_path)
+            os.replace(tmp_blocks, self.blocks_path)
+            os.replace(tmp_chunks, self.chunks_path)
+
+            self.block_offsets, self.block_lengths = new_offsets, new_lengths
+            self.chunk_blocks, self.chunk_slots = new_blocks, new_slots
+            self._stored, self._dead = len(live), 0
+            self._cache.clear()
+            self._remap()
+            return {"bytes_before": before, "bytes_after": offset, "live_chunks": len(live)}
+
+    # ------------ READ ------------
+    def _block(self, block_no: int) -> List[str]:
+        cached = self._cache.get(block_no)
+        if cached is not None:
+            self._cache.move_to_end(block_no)
+            return cached
+
+        off = self.block_offsets[block_no]
+        payload = self._mm[off:off + self.block_lengths[block_no]]
+        texts = json.loads(zlib.decompress(payload).decode("utf-8"))
+
+        self._cache[block_no] = texts
+        if len(self._cache) > BLOCK_CACHE_SIZE:
+            self._cache.popitem(last=False)
+        return texts
+
+    def get_many(self, ids: Iterable[int]) -> List[Optional[str]]:
+        """Bulk fetch; each block is decoded at most once. Unknown/deleted IDs give None."""
+        with self._lock:
+            out: List[Optional[str]] = []
+            for cid in ids:
+                if not self.is_live(cid):
+                    out.append(None)
+                    continue
+                out.append(self._block(self.chunk_blocks[cid])[self.chunk_slots[cid]])
+            return out
+
+    def is_live(self, cid: int) -> bool:
+        return (0 <= cid < len(self.chunk_blocks)
+                and self.chunk_blocks[cid] != DELETED
+                and not self.chunk_slots[cid] & TOMBSTONE)
+
+    def vector_id(self, cid: int) -> str:
+        """ID under which a chunk is stored in the vector index."""
+        return f"{self.store_id}:{cid}"
+
+    def parse_vector_id(self, vid: str) -> Optional[int]:
+        """Chunk ID for a vector index ID owned by this store, else None."""
+        prefix, sep, num = vid.partition(":")
+        if sep and prefix == self.store_id and num.isdigit():
+            return int(num)
+        return None
+
+    def get(self, cid: int) -> Optional[str]:
+        return self.get_many([cid])[0]
+
+    def document_ids(self, source: str) -> List[int]:
+        with self._lock:
+            return list(self.docs.get(source, []))
+
+    def dead_ratio(self) -> float:
+        """Fraction of the chunks physically in chunks.dat that are tombstoned."""
+        return self._dead / self._stored if self._stored else 0.0
+
+
+_store: Optional[ChunkStore] = None
+_store_lock = threading.Lock()
+
+
+def get_chunk_store() -> ChunkStore:
+    """Process-wide chunk store (opened lazily)."""
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = ChunkStore()
+        return _store
@@ -0,0 +1,235 @@
+# src/dedup.py
+"""
+Near-duplicate detection for ingest (MinHash + LSH banding).
+
+Every stored chunk gets a MinHash signature of its word shingles. New chunks
+are looked up through the LSH buckets before they are embedded; a chunk whose
+estimated Jaccard similarity to a stored one is above CHUNK_DUP_THRESHOLD is
+skipped. Whole documents are signed the same way, so a v1/v7 or preprint/
+camera-ready pair is linked to the copy that was ingested first.
+Matches are only made within one tenant (untenanted documents share a scope),
+since a tenant can only retrieve its own chunks.
+
+Files (next to the chunk store):
+  minhash_v2.bin   append-only (chunk id u32, NUM_PERM x u32) records
+  minhash_docs.json  source -> {"hash", "sig", "sig_version", "canonical", "refs", "tenant"}
+                   refs = stored chunk IDs (of other documents) this document's skipped chunks matched
+Signatures from an older SIG_VERSION are not compared: live chunks are
+re-signed from the chunk store on load, documents on their next ingest.
+"""
+import hashlib
+import json
+import os
+import re
+import struct
+import threading
+import zlib
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from src.chunk_store import CHUNK_STORE_DIR, get_chunk_store
+
+# ------------ CONFIG ------------
+NUM_PERM = 64
+BANDS = 16                    # NUM_PERM / BANDS rows per band → candidates from ~0.5 Jaccard
+SHINGLE_WORDS = 5
+CHUNK_DUP_THRESHOLD = 0.85
+DOC_DUP_THRESHOLD = 0.9
+SIG_VERSION = 2               # bump when minhash() changes; older signatures are recomputed
+
+ROWS = NUM_PERM // BANDS
+SIG_REC = struct.Struct(f"<I{NUM_PERM}I")
+LEGACY_SIG_FILES = ("minhash.bin",)
+
+_rng = np.random.default_rng(0x5EED)
+_SEEDS = _rng.integers(0, 2**64 - 1, NUM_PERM, dtype=np.uint64, endpoint=True)
+_MIX_1 = np.uint64(0xBF58476D1CE4E5B9)
+_MIX_2 = np.uint64(0x94D049BB133111EB)
+
+
+def normalize(text: str) -> str:
+    return " ".join(re.findall(r"[a-z0-9]+", text.lower()))
+
+
+def text_hash(text: str) -> str:
+    return hashlib.sha256(normalize(text).encode("utf-8")).hexdigest()
+
+
+def minhash(text: str) -> np.ndarray:
+    """MinHash signature (NUM_PERM x uint32) of the word shingles of `text`."""
+    words = normalize(text).split()
+    if len(words) <= SHINGLE_WORDS:
+        shingles = {" ".join(words)}
+    else:
+        shingles = {" ".join(words[i:i + SHINGLE_WORDS]) for i in range(len(words) - SHINGLE_WORDS + 1)}
+
+    x = np.fromiter((zlib.crc32(s.encode("utf-8")) for s in shingles), dtype=np.uint64, count=len(shingles))
+    # one seeded 64-bit mix (splitmix64 finalizer, wrapping arithmetic) per
+    # permutation, min over shingles; the top 32 bits are kept
+    h = x[None, :] ^ _SEEDS[:, None]
+    h = (h ^ (h >> np.uint64(30))) * _MIX_1
+    h = (h ^ (h >> np.uint64(27))) * _MIX_2
+    h ^= h >> np.uint64(31)
+    return (h.min(axis=1) >> np.uint64(32)).astype(np.uint32)
+
+
+def similarity(a: np.ndarray, b: np.ndarray) -> float:
+    """Estimated Jaccard similarity of two signatures."""
+    return float(np.count_nonzero(a == b)) / NUM_PERM
+
+
+def _band_keys(sig: np.ndarray) -> List[bytes]:
+    return [sig[i * ROWS:(i + 1) * ROWS].tobytes() for i in range(BANDS)]
+
+
+class SignatureIndex:
+    def __init__(self, directory: str = CHUNK_STORE_DIR):
+        self.dir = Path(directory)
+        self.dir.mkdir(parents=True, exist_ok=True)
+        self.chunks_path = self.dir / "minhash_v2.bin"
+        self.docs_path = self.dir / "minhash_docs.json"
+
+        self._lock = threading.RLock()
+        self.sigs: Dict[int, np.ndarray] = {}
+        self.scopes: Dict[int, str] = {}      # chunk id -> tenant ("" = untenanted)
+        self.buckets: List[Dict[bytes, List[int]]] = [{} for _ in range(BANDS)]
+        self.docs: Dict[str, dict] = {}
+        self._load()
+
+    # ------------ LOAD / PERSIST ------------
+    def _load(self):
+        store = get_chunk_store()
+        if self.docs_path.exists():
+            self.docs = json.loads(self.docs_path.read_text(encoding="utf-8"))
+        scopes = {
+            cid: self.docs.get(source, {}).get("tenant") or ""
+            for source, ids in store.docs.items() for cid in ids
+        }
+        if self.chunks_path.exists():
+            raw = self.chunks_path.read_bytes()
+            for rec in SIG_REC.iter_unpack(raw[: len(raw) - len(raw) % SIG_REC.size]):
+                if store.is_live(rec[0]):
+                    self._index(rec[0], np.array(rec[1:], dtype=np.uint32), scopes.get(rec[0], ""))
+
+        # Live chunks without a current signature (older SIG_VERSION, or a crash
+        # before the signature was written): sign them from the stored text
+        unsigned = sorted(cid for cid in scopes if cid not in self.sigs)
+        if unsigned:
+            with open(self.chunks_path, "ab") as f:
+                for cid, text in zip(unsigned, store.get_many(unsigned)):
+                    if text is None:
+                        continue
+                    sig = minhash(text)
+                    self._index(cid, sig, scopes[cid])
+                    f.write(SIG_REC.pack(cid, *sig.tolist()))
+        for name in LEGACY_SIG_FILES:
+            (self.dir / name).unlink(missing_ok=True)
+
+    def _save_docs(self):
+        tmp = self.docs_path.with_suffix(".tmp")
+        tmp.write_text(json.dumps(self.docs), encoding="utf-8")
+        os.replace(tmp, self.docs_path)
+
+    def _index(self, cid: int, sig: np.ndarray, scope: str):
+        self.sigs[cid] = sig
+        self.scopes[cid] = scope
+        for band, key in zip(self.buckets, _band_keys(sig)):
+            band.setdefault(key, []).append(cid)
+
+    # ------------ CHUNKS ------------
+    def find_chunk(self, sig: np.ndarray, scope: str = "") -> Optional[Tuple[int, float]]:
+        """Best stored near-duplicate in the same scope, as (chunk id, similarity)."""
+        with self._lock:
+            candidates = set()
+            for band, key in zip(self.buckets, _band_keys(sig)):
+                candidates.update(band.get(key, ()))
+            best = None
+            for cid in candidates:
+                if self.scopes.get(cid, "") != scope:
+                    continue
+                sim = similarity(sig, self.sigs[cid])
+                if sim >= CHUNK_DUP_THRESHOLD and (best is None or sim > best[1]):
+                    best = (cid, sim)
+            return best
+
+    def add_chunks(self, ids: List[int], sigs: List[np.ndarray], scope: str = ""):
+        with self._lock:
+            with open(self.chunks_path, "ab") as f:
+                for cid, sig in zip(ids, sigs):
+                    self._index(cid, sig, scope)
+                    f.write(SIG_REC.pack(cid, *sig.tolist()))
+
+    def remove_chunks(self, ids: List[int]):
+        """Forget deleted chunks (their records are skipped on the next load)."""
+        with self._lock:
+            for cid in ids:
+                sig = self.sigs.pop(cid, None)
+                self.scopes.pop(cid, None)
+                if sig is None:
+                    continue
+                for band, key in zip(self.buckets, _band_keys(sig)):
+                    members = band.get(key)
+                    if members and cid in members:
+                        members.remove(cid)
+                        if not members:
+                            del band[key]
+
+    # ------------ DOCUMENTS ------------
+    def document(self, source: str) -> Optional[dict]:
+        with self._lock:
+            return self.docs.get(source)
+
+    def find_document(self, source: str, sig: np.ndarray, scope: str = "") -> Optional[Tuple[str, float]]:
+        """Best canonical document in the same scope similar to `sig`, other than `source`."""
+        with self._lock:
+            best = None
+            for other, rec in self.docs.items():
+                if (other == source or rec.get("canonical") or (rec.get("tenant") or "") != scope
+                        or rec.get("sig_version") != SIG_VERSION):
+                    continue
+                sim = similarity(sig, np.array(rec["sig"], dtype=np.uint32))
+                if sim >= DOC_DUP_THRESHOLD and (best is None or sim > best[1]):
+                    best = (other, sim)
+            return best
+
+    def set_document(self, source: str, digest: str, sig: np.ndarray, canonical: Optional[str] = None,
+                     refs: Optional[List[int]] = None, tenant: Optional[str] = None):
+        with self._lock:
+            self.docs[source] = {"hash": digest, "sig": sig.tolist(), "sig_version": SIG_VERSION,
+                                 "canonical": canonical, "refs": sorted(refs or []), "tenant": tenant}
+            self._save_docs()
+
+    def dependents(self, source: str, removed_ids: List[int]) -> List[str]:
+        """
+        Documents that rely on `source`: duplicates linked to it, and documents
+        that skipped chunks as duplicates of chunks in `removed_ids`. Documents
+        whose refs already point at deleted chunks (left behind when a restore
+        run visits each document only once) are included, so they are re-linked.
+        """
+        store = get_chunk_store()
+        removed = set(removed_ids)
+        with self._lock:
+            return [s for s, rec in self.docs.items()
+                    if s != source and (rec.get("canonical") == source
+                                        or any(r in removed or not store.is_live(r) for r in rec.get("refs", ())))]
+
+    def remove_document(self, source: str):
+        """Drop a document's record (its dependents are re-ingested by the caller)."""
+        with self._lock:
+            self.docs.pop(source, None)
+            self._save_docs()
+
+
+_index: Optional[SignatureIndex] = None
+_index_lock = threading.Lock()
+
+
+def get_signature_index() -> SignatureIndex:
+    """Process-wide signature index (loaded lazily)."""
+    global _index
+    with _index_lock:
+        if _index is None:
+            _index = SignatureIndex()
+        return _index
@@ -0,0 +1,195 @@
+# src/embedding_cache.py
+"""
+Content-addressed embedding cache, keyed by (model name, normalised-text hash).
+
+- query vectors: in-memory LRU (QUERY_CACHE_SIZE entries)
+- chunk vectors: append-only on-disk store, read through np.memmap
+    keys.bin     20-byte sha1 digests, one per row
+    vectors.f32  float32 rows of the model's dimension, same order as keys.bin
+
+Batch encoding looks up the cache first and only sends misses to the model.
+"""
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import numpy as np
+from sentence_transformers import SentenceTransformer
+
+# ------------ CONFIG ------------
+EMBED_MODEL = "sentence-transformers/all-MiniLM-L6-v2"
+EMBED_CACHE_DIR = os.getenv("EMBED_CACHE_DIR", "data/embedding_cache")
+QUERY_CACHE_SIZE = 4096
+ENCODE_BATCH_SIZE = 64
+
+DIGEST_SIZE = 20
+
+
+def cache_key(model_name: str, text: str) -> bytes:
+    normalised = " ".join(text.split())
+    return hashlib.sha1(f"{model_name}\0{normalised}".encode("utf-8")).digest()
+
+
+class EmbeddingCache:
+    def __init__(self, model_name: str, dim: int, directory: str = EMBED_CACHE_DIR):
+        self.model_name = model_name
+        self.dim = dim
+        self.dir = Path(directory) / model_name.replace("/", "__")
+        self.dir.mkdir(parents=True, exist_ok=True)
+        self.keys_path = self.dir / "keys.bin"
+        self.vectors_path = self.dir / "vectors.f32"
+
+        self._lock = threading.Lock()
+        self._queries: "OrderedDict[bytes, np.ndarray]" = OrderedDict()
+        self._rows: Dict[bytes, int] = {}
+        self._mm: Optional[np.memmap] = None
+        self.stats = {"query_hits": 0, "query_misses": 0, "chunk_hits": 0, "chunk_misses": 0}
+        self._load()
+
+    def _load(self):
+        for p in (self.keys_path, self.vectors_path):
+            p.touch(exist_ok=True)
+        keys = self.keys_path.read_bytes()
+        rows = min(len(keys) // DIGEST_SIZE, self.vectors_path.stat().st_size // (4 * self.dim))
+        # drop partial/unpaired rows left by a crash between the two appends,
+        # so the next append starts at row `rows` in both files
+        os.truncate(self.keys_path, rows * DIGEST_SIZE)
+        os.truncate(self.vectors_path, rows * 4 * self.dim)
+        for row in range(rows):
+            self._rows[keys[row * DIGEST_SIZE:(row + 1) * DIGEST_SIZE]] = row
+        self._remap()
+
+    def _remap(self):
+        rows = len(self._rows)
+        self._mm = (
+            np.memmap(self.vectors_path, dtype=np.float32, mode="r", shape=(rows, self.dim))
+            if rows else None
+        )
+
+    # ------------ QUERIES (memory LRU) ------------
+    def get_query(self, key: bytes) -> Optional[np.ndarray]:
+        with self._lock:
+            vec = self._queries.get(key)
+            if vec is None:
+                vec = self._get_rows([key]).get(key)
+                if vec is None:
+                    self.stats["query_misses"] += 1
+                    return None
+            self._queries[key] = vec
+            self._queries.move_to_end(key)
+            self.stats["query_hits"] += 1
+            return vec
+
+    def put_query(self, key: bytes, vec: np.ndarray):
+        with self._lock:
+            self._queries[key] = vec
+            if len(self._queries) > QUERY_CACHE_SIZE:
+                self._queries.popitem(last=False)
+
+    # ------------ CHUNKS (disk) ------------
+    def _get_rows(self, keys: List[bytes]) -> Dict[bytes, np.ndarray]:
+        found = [(k, self._rows[k]) for k in keys if k in self._rows]
+        if not found:
+            return {}
+        matrix = np.asarray(self._mm[[row for _, row in found]])
+        return {k: matrix[i] for i, (k, _) in enumerate(found)}
+
+    def get_chunks(self, keys: List[bytes]) -> Dict[bytes, np.ndarray]:
+        with self._lock:
+            hits = self._get_rows(keys)
+            self.stats["chunk_hits"] += len(hits)
+            self.stats["chunk_misses"] += len(keys) - len(hits)
+            return hits
+
+    def put_chunks(self, keys: List[bytes], matrix: np.ndarray):
+        with self._lock:
+            new = [(k, i) for i, k in enumerate(keys) if k not in self._rows]
+            if not new:
+                return
+            rows = np.ascontiguousarray(matrix[[i for _, i in new]], dtype=np.float32)
+            with open(self.vectors_path, "ab") as f:
+                f.write(rows.tobytes())
+            with open(self.keys_path, "ab") as f:
+                f.write(b"".join(k for k, _ in new))
+            for k, _ in new:
+                self._rows[k] = len(self._rows)
+            self._remap()
+
+    # ------------ STATS ------------
+    def snapshot(self) -> dict:
+        with self._lock:
+            s = dict(self.stats)
+            q = s["query_hits"] + s["query_misses"]
+            c = s["chunk_hits"] + s["chunk_misses"]
+            s.update({
+                "model": self.model_name,
+                "query_hit_rate": round(s["query_hits"] / q, 3) if q else 0.0,
+                "chunk_hit_rate": round(s["chunk_hits"] / c, 3) if c else 0.0,
+                "query_entries": len(self._queries),
+                "chunk_entries": len(self._rows),
+                "memory_bytes": sum(v.nbytes for v in self._queries.values()),
+                "disk_bytes": self.vectors_path.stat().st_size + self.keys_path.stat().st_size,
+            })
+            return s
+
+
+class CachedEmbeddings:
+    """
+    LangChain-compatible embeddings (embed_query / embed_documents) over a
+    SentenceTransformer, with the cache in front of every encode.
+    """
+    def __init__(self, model_name: str = EMBED_MODEL):
+        self.model_name = model_name
+        self.model = SentenceTransformer(model_name)
+        self.cache = EmbeddingCache(model_name, self.model.get_sentence_embedding_dimension())
+
+    def encode_query(self, text: str) -> np.ndarray:
+        key = cache_key(self.model_name, text)
+        vec = self.cache.get_query(key)
+        if vec is None:
+            vec = self.model.encode(text, convert_to_numpy=True).astype(np.float32)
+            self.cache.put_query(key, vec)
+        return vec
+
+    def encode_documents(self, texts: List[str]) -> np.ndarray:
+        keys = [cache_key(self.model_name, t) for t in texts]
+        hits = self.cache.get_chunks(keys)
+
+        # encode each distinct missing text once, in batches
+        misses: Dict[bytes, str] = {}
+        for k, t in zip(keys, texts):
+            if k not in hits and k not in misses:
+                misses[k] = t
+        if misses:
+            encoded = self.model.encode(
+                list(misses.values()), batch_size=ENCODE_BATCH_SIZE, convert_to_numpy=True
+            ).astype(np.float32)
+            self.cache.put_chunks(list(misses), encoded)
+            hits.update(zip(misses, encoded))
+
+        out = np.empty((len(texts), self.cache.dim), dtype=np.float32)
+        for i, k in enumerate(keys):
+            out[i] = hits[k]
+        return out
+
+    def embed_query(self, text):
+        return self.encode_query(text).tolist()
+
+    def embed_documents(self, texts):
+        return self.encode_documents(texts).tolist()
+
+
+_embeddings: Optional[CachedEmbeddings] = None
+_embeddings_lock = threading.Lock()
+
+
+def get_embeddings() -> CachedEmbeddings:
+    """Process-wide embedding model + cache (loaded lazily, once)."""
+    global _embeddings
+    with _embeddings_lock:
+        if _embeddings is None:
+            _embeddings = CachedEmbeddings()
+        return _embeddings
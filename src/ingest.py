@@ -1,10 +1,12 @@
 from langchain_text_splitters import RecursiveCharacterTextSplitter
-from langchain_huggingface.embeddings import HuggingFaceEmbeddings
-from langchain_astradb import AstraDBVectorStore
 import os
+from collections import deque
 from pathlib import Path
-from src.config import ASTRA_DB_TOKEN, ASTRA_DB_ENDPOINT, VECTOR_COLLECTION
+from typing import List, Optional, Tuple
 from src.utils import extract_text_from_pdf
+from src.chunk_store import get_chunk_store
+from src.dedup import CHUNK_DUP_THRESHOLD, SIG_VERSION, get_signature_index, minhash, similarity, text_hash
+from src.shards import assign, forget, get_shard_store
 
 # ------------ CONFIG ------------
 DATA_DIRS = [
@@ -13,10 +15,67 @@ DATA_DIRS = [
     "data/uploaded_papers",  # upload folder (if used)
 ]
 
+
+def _read_text(path: str) -> str:
+    if path.lower().endswith(".pdf"):
+        return extract_text_from_pdf(path)
+    with open(path, "r", encoding="utf-8") as f:
+        return f.read()
+
+
+def _unstore(source: str):
+    """Remove a document's chunks from the chunk store, signature index and its shard."""
+    store = get_chunk_store()
+    old_ids = store.delete_document(source)
+    get_signature_index().remove_chunks(old_ids)
+    old_shard = forget(source)
+    if old_ids:
+        get_shard_store(old_shard).delete(ids=[store.vector_id(i) for i in old_ids])
+    return old_ids
+
+
+def _restore(source: str, dependents: List[str]):
+    """
+    Re-ingest documents that relied on a removed or changed document: linked
+    duplicates (re-linked to the new version, or promoted to canonical) and
+    documents whose skipped chunks pointed at chunks that were just removed.
+
+    Restoring one document can make others (or `source` itself) dependents in
+    turn, e.g. two documents that each skipped chunks of the other. Each
+    document is restored at most once per run, and `source` never is.
+    """
+    results = []
+    index = get_signature_index()
+    visited = {source}
+    pending = deque(dependents)
+    while pending:
+        dep = pending.popleft()
+        if dep in visited:
+            continue
+        visited.add(dep)
+        if Path(dep).is_file():
+            tenant = (index.document(dep) or {}).get("tenant")
+            index.remove_document(dep)   # force a full re-ingest
+            result, more = _store(dep, _read_text(dep), tenant)
+        else:
+            result, more = _delete(dep)
+        results.append(result)
+        pending.extend(more)
+    return results
+
+
 # ------------ INGEST ONE DOCUMENT ------------
-def store_documents(file_path: str, text: str):
+def store_documents(file_path: str, text: str, tenant: Optional[str] = None):
+    result, dependents = _store(file_path, text, tenant)
+    if dependents:
+        result["restored"] = _restore(str(Path(file_path).resolve()), dependents)
+    return result
+
+
+def _store(file_path: str, text: str, tenant: Optional[str]) -> Tuple[dict, List[str]]:
+    """Ingest (or re-ingest) one document; returns (result, documents to restore)."""
     if not text or len(text.strip()) < 50:
-        return {"status": "skipped", "message": f"No usable text extracted from {file_path}"}
+        return {"status": "skipped", "message": f"No usable text extracted from {file_path}"}, []
 
     splitter = RecursiveCharacterTextSplitter(
         chunk_size=1000,
@@ -24,27 +83,124 @@ def store_documents(file_path: str, text: str):
     )
     chunks = splitter.split_text(text)
 
-    embeddings = HuggingFaceEmbeddings(model_name="sentence-transformers/all-MiniLM-L6-v2")
+    source = str(Path(file_path).resolve())
+    index = get_signature_index()
+
+    # Same file, same text, same tenant (and a current signature) → nothing to do
+    digest = text_hash(text)
+    previous = index.document(source)
+    if (previous and previous["hash"] == digest and previous.get("tenant") == tenant
+            and previous.get("sig_version") == SIG_VERSION):
+        return {"status": "unchanged", "file": file_path, "chunks_total": len(chunks), "chunks_stored": 0}, []
+
+    # Re-ingesting a changed file replaces its previous chunks;
+    # documents that relied on them are restored afterwards
+    old_ids = _unstore(source)
+    dependents = index.dependents(source, old_ids)
+
+    return _store_new(file_path, source, text, chunks, digest, tenant), dependents
 
-    vector_store = AstraDBVectorStore(
-        collection_name=VECTOR_COLLECTION,
-        embedding=embeddings,
-        token=ASTRA_DB_TOKEN,
-        api_endpoint=ASTRA_DB_ENDPOINT
-    )
 
-    vector_store.add_texts(chunks)
+def _store_new(file_path: str, source: str, text: str, chunks, digest: str, tenant: Optional[str]):
+    store = get_chunk_store()
+    index = get_signature_index()
+
+    # Near-duplicate of a document we already have (v1/v7, preprint/camera-ready);
+    # only within the same tenant, since tenants only retrieve their own chunks
+    scope = tenant or ""
+    doc_sig = minhash(text)
+    match = index.find_document(source, doc_sig, scope)
+    if match:
+        canonical, sim = match
+        index.set_document(source, digest, doc_sig, canonical=canonical, tenant=tenant)
+        return {
+            "status": "duplicate",
+            "file": file_path,
+            "canonical": canonical,
+            "similarity": round(sim, 3),
+            "chunks_total": len(chunks),
+            "chunks_stored": 0
+        }
+
+    # Chunk-level: skip chunks that repeat stored (or earlier) ones,
+    # remembering which stored chunk each skipped one relies on
+    unique, unique_sigs, refs = [], [], set()
+    for chunk in chunks:
+        sig = minhash(chunk)
+        match = index.find_chunk(sig, scope)
+        if match:
+            refs.add(match[0])
+            continue
+        if any(similarity(sig, u) >= CHUNK_DUP_THRESHOLD for u in unique_sigs):
+            continue
+        unique.append(chunk)
+        unique_sigs.append(sig)
+
+    new_ids = store.append(unique, source)
+    index.add_chunks(new_ids, unique_sigs, scope)
+
+    # Route by tenant (one team/domain per shard) or by document hash
+    shard = assign(source, tenant or digest, tenant)
+    if new_ids:
+        ids = [store.vector_id(i) for i in new_ids]
+        metadatas = [{"tenant": tenant}] * len(ids) if tenant else None
+        try:
+            get_shard_store(shard).add_texts(ids, metadatas=metadatas, ids=ids)
+        except Exception:
+            # Undo the local writes and drop the old record, so the next
+            # ingest retries instead of seeing an "unchanged" document
+            store.delete_document(source)
+            index.remove_chunks(new_ids)
+            index.remove_document(source)
+            forget(source)
+            raise
+
+    # Recorded last: a document with a record is fully indexed
+    index.set_document(source, digest, doc_sig, refs=refs, tenant=tenant)
 
     return {
         "status": "success",
         "file": file_path,
-        "chunks_stored": len(chunks)
+        "shard": shard,
+        "chunks_total": len(chunks),
+        "chunks_stored": len(unique),
+        "duplicates_skipped": len(chunks) - len(unique)
     }
 
+
+# ------------ REMOVE ONE DOCUMENT ------------
+def delete_document(file_path: str):
+    result, dependents = _delete(file_path)
+    if dependents:
+        result["restored"] = _restore(str(Path(file_path).resolve()), dependents)
+    return result
+
+
+def _delete(file_path: str) -> Tuple[dict, List[str]]:
+    """Remove one document; returns (result, documents to restore)."""
+    source = str(Path(file_path).resolve())
+    index = get_signature_index()
+    if index.document(source) is None:
+        return {"status": "not_found", "file": file_path}, []
+
+    ids = _unstore(source)
+    dependents = index.dependents(source, ids)
+    index.remove_document(source)
+    return {"status": "deleted", "file": file_path, "chunks_removed": len(ids)}, dependents
+
 # ------------ MAIN INGEST FUNCTION ------------
+def _tally(stats: dict, result: dict):
+    stats[result["status"]] = stats.get(result["status"], 0) + 1
+    stats["chunks_seen"] += result.get("chunks_total", 0)
+    stats["chunks_stored"] += result.get("chunks_stored", 0)
+    if result["status"] in ("success", "duplicate"):
+        stats["chunks_deduped"] += result["chunks_total"] - result["chunks_stored"]
+
+
 def ingest_documents():
     total_files = 0
     total_chunks = 0
+    stats = {"chunks_seen": 0, "chunks_stored": 0, "chunks_deduped": 0}
 
     for directory in DATA_DIRS:
         path = Path(directory)
@@ -56,6 +212,7 @@ def ingest_documents():
             text = extract_text_from_pdf(str(pdf))
             result = store_documents(str(pdf), text)
             print(result)
+            _tally(stats, result)
 
             if result["status"] == "success":
                 total_files += 1
@@ -67,6 +224,7 @@ def ingest_documents():
                 text = f.read()
             result = store_documents(str(txt), text)
             print(result)
+            _tally(stats, result)
 
             if result["status"] == "success":
                 total_files += 1
@@ -75,5 +233,10 @@ def ingest_documents():
     return {
         "status": "completed",
         "files_ingested": total_files,
-        "total_chunks": total_chunks
+        "total_chunks": total_chunks,
+        "duplicate_documents": stats.get("duplicate", 0),
+        "unchanged_documents": stats.get("unchanged", 0),
+        "duplicate_chunks": stats["chunks_deduped"],
+        # share of new (non-unchanged) chunks that were not embedded
+        "dedup_ratio": round(stats["chunks_deduped"] / max(stats["chunks_deduped"] + stats["chunks_stored"], 1), 3)
     }
@@ -0,0 +1,147 @@
+# src/rerank.py
+"""
+Optional cross-encoder reranking of retrieved chunks (RERANK_ENABLED=1).
+
+The bi-encoder over-fetches RERANK_CANDIDATES chunks, a local cross-encoder
+scores every (query, chunk) pair in one batched forward pass, and only the
+best RERANK_KEEP chunks go into the prompt. Pair scores are cached, and if
+scoring does not finish within RERANK_BUDGET_MS the bi-encoder order is used
+(the late scores still land in the cache for next time). Cached pairs are
+looked up first; only uncached pairs go to the scorer, and while it is busy
+with another query those fall back at once instead of queueing.
+"""
+import hashlib
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+from typing import Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# ------------ CONFIG ------------
+RERANK_ENABLED = os.getenv("RERANK_ENABLED", "0") == "1"
+RERANK_MODEL = os.getenv("RERANK_MODEL", "cross-encoder/ms-marco-MiniLM-L-6-v2")
+RERANK_CANDIDATES = 30        # bi-encoder over-fetch
+RERANK_KEEP = 5               # chunks kept for the prompt (never more than k)
+RERANK_BUDGET_MS = 400
+SCORE_CACHE_SIZE = 20000
+
+_pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix="rerank")
+_model = None
+_model_lock = threading.Lock()
+_scores: "OrderedDict[bytes, float]" = OrderedDict()
+_scores_lock = threading.Lock()
+_pending = 0                  # scoring batches submitted and not yet finished
+_pending_lock = threading.Lock()
+
+
+def _get_model():
+    global _model
+    with _model_lock:
+        if _model is None:
+            from sentence_transformers import CrossEncoder
+            _model = CrossEncoder(RERANK_MODEL)
+        return _model
+
+
+def warm_up():
+    """Load the cross-encoder up front so the first query is not spent loading it."""
+    if RERANK_ENABLED:
+        _get_model()
+
+
+def _pair_key(query: str, chunk: str) -> bytes:
+    return hashlib.sha1(f"{RERANK_MODEL}\0{query}\0{chunk}".encode("utf-8")).digest()
+
+
+def _cached(keys: List[bytes]) -> Dict[bytes, float]:
+    """Cached scores for `keys` (LRU: hits become most recent)."""
+    found = {}
+    with _scores_lock:
+        for k in keys:
+            if k in _scores:
+                _scores.move_to_end(k)
+                found[k] = _scores[k]
+    return found
+
+
+def _score(query: str, missing: List[Tuple[bytes, str]]) -> Dict[bytes, float]:
+    """Score (key, chunk) pairs in one batch and cache them."""
+    preds = _get_model().predict([(query, c) for _, c in missing], batch_size=len(missing))
+    found = {}
+    with _scores_lock:
+        for (k, _), s in zip(missing, preds):
+            _scores[k] = float(s)
+            _scores.move_to_end(k)
+            found[k] = float(s)
+        while len(_scores) > SCORE_CACHE_SIZE:
+            _scores.popitem(last=False)
+    return found
+
+
+def _submit(query: str, missing: List[Tuple[bytes, str]]):
+    """Submit a scoring batch, or return None if the scorer is already busy."""
+    global _pending
+    with _pending_lock:
+        if _pending:
+            return None
+        _pending += 1
+
+    def _finished(_):
+        global _pending
+        with _pending_lock:
+            _pending -= 1
+
+    future = _pool.submit(_score, query, missing)
+    future.add_done_callback(_finished)
+    return future
+
+
+def rerank(query: str, chunks: List[str], k: int, budget_s: Optional[float] = None) -> Tuple[List[str], dict]:
+    """
+    Reorder bi-encoder `chunks` (best first) by cross-encoder score and keep
+    min(k, RERANK_KEEP). Returns (kept chunks, report). The report compares the
+    prompt size against the plain bi-encoder top-k.
+    """
+    keep = min(k, RERANK_KEEP)
+    budget = RERANK_BUDGET_MS / 1000 if budget_s is None else min(budget_s, RERANK_BUDGET_MS / 1000)
+    baseline_chars = sum(len(c) for c in chunks[:k])
+
+    started = time.perf_counter()
+    fallback = None
+    keys = [_pair_key(query, c) for c in chunks]
+    scores = _cached(keys)
+    missing = [(key, c) for key, c in zip(keys, chunks) if key not in scores]
+    future = _submit(query, missing) if missing else None
+    if missing and future is None:
+        fallback = "busy"
+        kept = chunks[:keep]
+    else:
+        try:
+            if future is not None:
+                scores.update(future.result(timeout=budget))
+            order = sorted(range(len(chunks)), key=lambda i: scores[keys[i]], reverse=True)
+            kept = [chunks[i] for i in order[:keep]]
+        except FutureTimeout:
+            future.cancel()   # drop it if it has not started; a running batch still fills the cache
+            fallback = "budget_exceeded"
+            kept = chunks[:keep]
+        except Exception as e:
+            logger.warning("Reranking failed, using bi-encoder order: %s", e)
+            fallback = "error"
+            kept = chunks[:keep]
+
+    kept_chars = sum(len(c) for c in kept)
+    report = {
+        "candidates": len(chunks),
+        "kept": len(kept),
+        "fallback": fallback,
+        "latency_ms": round((time.perf_counter() - started) * 1000, 1),
+        "prompt_chars_baseline": baseline_chars,
+        "prompt_chars": kept_chars,
+        "prompt_chars_saved": baseline_chars - kept_chars,
+    }
+    return kept, report
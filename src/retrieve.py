@@ -1,28 +1,77 @@
-from sentence_transformers import SentenceTransformer
-from langchain_astradb import AstraDBVectorStore
-from src.config import VECTOR_COLLECTION, ASTRA_DB_TOKEN, ASTRA_DB_ENDPOINT
-
-
-class LocalEmbeddings:
-    def __init__(self):
-        self.model = SentenceTransformer("all-MiniLM-L6-v2")
-
-    def embed_query(self, text):
-        return self.model.encode(text).tolist()
-
-    def embed_documents(self, texts):
-        return self.model.encode(texts).tolist()
-    
-def retrieve_context(query: str, k = 4 ) -> str:
-    embeddings = LocalEmbeddings()
-    vectore_store = AstraDBVectorStore(
-        collection_name=VECTOR_COLLECTION,
-        embedding=embeddings,
-        token=ASTRA_DB_TOKEN,
-        api_endpoint=ASTRA_DB_ENDPOINT
-    )
-
-    docs = vectore_store.similarity_search(query, k=k)
-    if not docs:
-        return ""
-    return "\n".join([doc.page_content for doc in docs])
+import logging
+from typing import List, Optional, Tuple
+from src.admission import Deadline
+from src.chunk_store import VECTOR_ID_RE, get_chunk_store
+from src.embedding_cache import get_embeddings
+from src.shards import search_shards
+from src.rerank import RERANK_CANDIDATES, RERANK_ENABLED, rerank
+
+logger = logging.getLogger(__name__)
+
+
+def retrieve_context(query: str, k = 4, tenant: Optional[str] = None,
+                     deadline: Optional[Deadline] = None) -> str:
+    chunks, _ = retrieve_chunks(query, k=k, tenant=tenant, deadline=deadline)
+    return "\n".join(chunks)
+
+
+def retrieve_chunks(query: str, k = 4, tenant: Optional[str] = None,
+                    deadline: Optional[Deadline] = None,
+                    use_rerank: Optional[bool] = None) -> Tuple[List[str], dict]:
+    """
+    Top chunks for a query, plus a report of how they were selected.
+    With reranking, the bi-encoder over-fetches and the cross-encoder keeps the best few.
+    """
+    use_rerank = RERANK_ENABLED if use_rerank is None else use_rerank
+    fetch_k = max(k, RERANK_CANDIDATES) if use_rerank else k
+
+    # Cached query embedding (repeated/popular queries skip the model)
+    embeddings = get_embeddings()
+    vector = embeddings.embed_query(query)
+
+    # Embed once, then scatter-gather across the shards (within the request deadline)
+    if deadline:
+        deadline.check("retrieve")
+    timeout = deadline.remaining() if deadline else None
+    hits, stats = search_shards(vector, k=fetch_k, tenant=tenant, timeout=timeout)
+    if stats["failed"] or stats["timed_out"]:
+        logger.warning("Partial retrieval for '%s': %s", query, stats)
+    if not hits:
+        return [], {"shards": stats}
+
+    chunks = resolve_chunks([doc.page_content for doc, _ in hits])
+    if not use_rerank:
+        return chunks[:k], {"shards": stats}
+
+    budget = deadline.remaining() if deadline else None
+    kept, report = rerank(query, chunks, k, budget_s=budget)
+    return kept, {"shards": stats, "rerank": report}
+
+
+def resolve_chunks(hits):
+    """
+    The index returns chunk IDs; fetch their text from the chunk store in one
+    bulk read. IDs from another store (e.g. a lost local volume) or of deleted
+    chunks are dropped; legacy full-text rows pass through as-is.
+    """
+    store = get_chunk_store()
+    parsed = [store.parse_vector_id(h) for h in hits]
+    ids = [cid for cid in parsed if cid is not None]
+    texts = dict(zip(ids, store.get_many(ids)))
+
+    out = []
+    stale = 0
+    for h, cid in zip(hits, parsed):
+        if cid is not None:
+            text = texts.get(cid)
+        elif VECTOR_ID_RE.match(h) or h.isdigit():
+            text = None
+        else:
+            text = h
+        if text:
+            out.append(text)
+        else:
+            stale += 1
+    if stale:
+        logger.warning("Dropped %d index hits not owned by this chunk store", stale)
+    return out
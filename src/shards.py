@@ -0,0 +1,213 @@
+# src/shards.py
+"""
+Corpus sharding across several AstraDB collections.
+
+- Shard 0 is VECTOR_COLLECTION itself, shard i > 0 is "<VECTOR_COLLECTION>_shard<i>".
+- Documents are routed by rendezvous hashing of their routing key (tenant name,
+  or the document's text hash), so adding shards only moves ~1/N of documents.
+- Queries fan out to every relevant shard, each on its own small thread pool so a
+  hung shard only ties up its own workers; per-shard top-k lists are merged with
+  a heap, and shards that miss SHARD_TIMEOUT_S are left out.
+  Shards recorded in the manifest are searched too, so documents stay
+  findable between a SHARD_COUNT change and the next /rebalance.
+"""
+import hashlib
+import heapq
+import json
+import logging
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait
+from functools import lru_cache
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from langchain_astradb import AstraDBVectorStore
+from src.config import ASTRA_DB_TOKEN, ASTRA_DB_ENDPOINT, VECTOR_COLLECTION
+from src.chunk_store import CHUNK_STORE_DIR, get_chunk_store
+from src.embedding_cache import get_embeddings
+
+logger = logging.getLogger(__name__)
+
+# ------------ CONFIG ------------
+SHARD_COUNT = int(os.getenv("SHARD_COUNT", "1"))
+SHARD_TIMEOUT_S = float(os.getenv("SHARD_TIMEOUT_S", "5"))
+SHARD_WORKERS = int(os.getenv("SHARD_WORKERS", "4"))   # concurrent searches per shard
+SHARD_MANIFEST = Path(CHUNK_STORE_DIR) / "shards.json"
+
+_manifest_lock = threading.Lock()
+_manifest: Optional[Dict[str, dict]] = None
+
+
+class ChunkIdEmbeddings:
+    """
+    The vector index stores chunk IDs as its text. This wrapper resolves those
+    IDs against the chunk store so the vectors are still computed from the real text.
+    """
+    def __init__(self, base):
+        self.base = base
+        self.store = get_chunk_store()
+
+    def embed_documents(self, ids):
+        return self.base.embed_documents(self.store.get_many([self.store.parse_vector_id(i) for i in ids]))
+
+    def embed_query(self, text):
+        return self.base.embed_query(text)
+
+
+# ------------ ROUTING ------------
+def shard_name(shard: int) -> str:
+    return VECTOR_COLLECTION if shard == 0 else f"{VECTOR_COLLECTION}_shard{shard}"
+
+
+def route(key: str, shard_count: int = SHARD_COUNT) -> int:
+    """Rendezvous (highest random weight) hashing of a routing key onto a shard."""
+    return max(
+        range(shard_count),
+        key=lambda s: hashlib.blake2b(f"{s}:{key}".encode("utf-8"), digest_size=8).digest(),
+    )
+
+
+@lru_cache(maxsize=None)
+def get_shard_store(shard: int) -> AstraDBVectorStore:
+    return AstraDBVectorStore(
+        collection_name=shard_name(shard),
+        embedding=ChunkIdEmbeddings(get_embeddings()),
+        token=ASTRA_DB_TOKEN,
+        api_endpoint=ASTRA_DB_ENDPOINT
+    )
+
+
+# ------------ MANIFEST (source -> shard, routing key, tenant) ------------
+def _read_manifest() -> Dict[str, dict]:
+    """In-memory manifest (loaded once); call with _manifest_lock held."""
+    global _manifest
+    if _manifest is None:
+        _manifest = {}
+        if SHARD_MANIFEST.exists():
+            _manifest = json.loads(SHARD_MANIFEST.read_text(encoding="utf-8"))
+    return _manifest
+
+
+def _write_manifest(manifest: Dict[str, dict]):
+    global _manifest
+    _manifest = manifest
+    SHARD_MANIFEST.parent.mkdir(parents=True, exist_ok=True)
+    tmp = SHARD_MANIFEST.with_suffix(".tmp")
+    tmp.write_text(json.dumps(manifest), encoding="utf-8")
+    os.replace(tmp, SHARD_MANIFEST)
+
+
+def placement(source: str) -> Optional[dict]:
+    with _manifest_lock:
+        return _read_manifest().get(source)
+
+
+def assign(source: str, key: str, tenant: Optional[str] = None) -> int:
+    """Record where a document lives and return its shard."""
+    shard = route(key)
+    with _manifest_lock:
+        manifest = _read_manifest()
+        manifest[source] = {"shard": shard, "key": key, "tenant": tenant}
+        _write_manifest(manifest)
+    return shard
+
+
+def query_shards(tenant: Optional[str] = None) -> List[int]:
+    """
+    Shards a query must search: the routed ones under the current SHARD_COUNT
+    plus any shard the manifest still places matching documents on.
+    """
+    with _manifest_lock:
+        placed = {e["shard"] for e in _read_manifest().values() if not tenant or e.get("tenant") == tenant}
+    routed = {route(tenant)} if tenant else set(range(SHARD_COUNT))
+    return sorted(routed | placed)
+
+
+def forget(source: str) -> int:
+    """Drop a document from the manifest; returns the shard it was on (0 for legacy docs)."""
+    with _manifest_lock:
+        manifest = _read_manifest()
+        entry = manifest.pop(source, None)
+        _write_manifest(manifest)
+    return entry["shard"] if entry else 0
+
+
+# ------------ SCATTER-GATHER SEARCH ------------
+@lru_cache(maxsize=None)
+def _search_pool(shard: int) -> ThreadPoolExecutor:
+    """Per-shard search pool: a slow or hung shard cannot starve searches of the others."""
+    return ThreadPoolExecutor(max_workers=SHARD_WORKERS, thread_name_prefix=f"shard{shard}")
+
+
+def _search_one(shard: int, vector: List[float], k: int, search_filter: Optional[dict]):
+    # Store construction (a provisioning call on first use) runs here, inside
+    # the pool task, so it is covered by the shard timeout and fails per shard.
+    return get_shard_store(shard).similarity_search_with_score_by_vector(vector, k=k, filter=search_filter)
+
+
+def search_shards(vector: List[float], k: int, tenant: Optional[str] = None,
+                  timeout: Optional[float] = None) -> Tuple[list, dict]:
+    """
+    Similarity search over all shards (or only the tenant's shard).
+    `timeout` (e.g. the request's remaining deadline) can shorten SHARD_TIMEOUT_S.
+    Returns (top-k [(doc, score), ...] merged across shards, stats).
+    """
+    timeout = SHARD_TIMEOUT_S if timeout is None else min(timeout, SHARD_TIMEOUT_S)
+    shards = query_shards(tenant)
+    search_filter = {"tenant": tenant} if tenant else None
+
+    futures = {_search_pool(s).submit(_search_one, s, vector, k, search_filter): s for s in shards}
+    done, pending = wait(futures, timeout=timeout)
+    for fut in pending:
+        fut.cancel()   # searches still queued behind a slow shard are dropped, not run late
+
+    failed = []
+    per_shard = []
+    for fut in done:
+        if fut.exception() is not None:
+            logger.warning("Shard %s search failed: %s", futures[fut], fut.exception())
+            failed.append(futures[fut])
+            continue
+        per_shard.append(fut.result())
+    timed_out = sorted(futures[f] for f in pending)
+    if timed_out:
+        logger.warning("Shards %s exceeded %.1fs; returning partial results", timed_out, timeout)
+
+    hits = heapq.nlargest(k, (hit for hits in per_shard for hit in hits), key=lambda h: h[1])
+    stats = {"shards": len(shards), "failed": sorted(failed), "timed_out": timed_out}
+    return hits, stats
+
+
+# ------------ REBALANCING ------------
+def rebalance() -> dict:
+    """
+    Move documents whose shard changed (e.g. after raising SHARD_COUNT).
+    Chunk text comes from the chunk store, so nothing is re-read from disk.
+    """
+    store = get_chunk_store()
+    with _manifest_lock:
+        manifest = dict(_read_manifest())
+
+    moved = chunks_moved = 0
+    for source, entry in manifest.items():
+        target = route(entry["key"])
+        if target == entry["shard"]:
+            continue
+
+        ids = [store.vector_id(i) for i in store.document_ids(source)]
+        if ids:
+            metadatas = [{"tenant": entry["tenant"]}] * len(ids) if entry.get("tenant") else None
+            get_shard_store(target).add_texts(ids, metadatas=metadatas, ids=ids)
+            get_shard_store(entry["shard"]).delete(ids=ids)
+
+        logger.info("Moved %s from shard %s to %s (%d chunks)", source, entry["shard"], target, len(ids))
+        with _manifest_lock:
+            current = _read_manifest()
+            if source in current:
+                current[source]["shard"] = target
+                _write_manifest(current)
+        moved += 1
+        chunks_moved += len(ids)
+
+    return {"status": "completed", "shard_count": SHARD_COUNT, "documents_moved": moved, "chunks_moved": chunks_moved}
@@ -0,0 +1,204 @@
+# src/summarize.py
+"""
+Whole-document (map-reduce) summarisation for ingested papers.
+
+1) split the paper into sections (numbered headings, falling back to size-based chunks)
+2) MAP: summarise every section in parallel through the LLM (bounded pool)
+3) REDUCE: merge the section summaries in small groups, level by level, into one summary
+
+Every LLM call is cached by the hash of its input, so repeated or overlapping
+requests only pay for the sections they have not seen yet.
+"""
+import hashlib
+import logging
+import re
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, Future, as_completed
+from typing import Dict, Iterator, List, Tuple
+
+from langchain_groq import ChatGroq
+from langchain_text_splitters import RecursiveCharacterTextSplitter
+from src.config import GROQ_API_KEY, LLAMA_MODEL
+
+logger = logging.getLogger(__name__)
+
+# controllable settings
+MAP_CONCURRENCY = 4           # max LLM calls in flight (shared by all requests)
+MAX_SECTION_CHARS = 6000      # larger sections are split before the map stage
+MIN_SECTION_CHARS = 800       # smaller sections are merged into the previous one
+REDUCE_FANOUT = 6             # summaries merged per reduce call
+SUMMARY_MAX_TOKENS = 600
+LLM_TEMPERATURE = 0.0
+SUMMARY_CACHE_SIZE = 4096     # cached LLM outputs (section + reduce summaries)
+
+# "3 Model Architecture", "3.2.1 Scaled Dot-Product Attention", "Abstract", ...
+HEADING_RE = re.compile(
+    r"^(?:\d{1,2}(?:\.\d{1,2}){0,3}\.?\s+[A-Z][^\n]{2,80}"
+    r"|(?:Abstract|Introduction|Background|Related Work|Conclusions?|Discussion"
+    r"|Acknowledge?ments|References|Bibliography|Appendix[^\n]{0,60}))\s*$",
+    re.MULTILINE,
+)
+STOP_SECTIONS = ("references", "bibliography")
+
+_llm_pool = ThreadPoolExecutor(max_workers=MAP_CONCURRENCY, thread_name_prefix="summarize")
+_cache: "OrderedDict[str, str]" = OrderedDict()
+_inflight: Dict[str, Future] = {}
+_cache_lock = threading.Lock()
+
+
+# ------------ SECTION SPLITTING ------------
+def split_sections(text: str) -> List[Tuple[str, str]]:
+    """
+    Return [(title, body), ...] for a paper. Bibliography sections are dropped,
+    tiny sections are merged into their predecessor, oversized ones are split.
+    """
+    matches = list(HEADING_RE.finditer(text))
+    raw: List[Tuple[str, str]] = []
+
+    if matches:
+        preamble = text[: matches[0].start()].strip()
+        if preamble:
+            raw.append(("Front matter", preamble))
+        for i, m in enumerate(matches):
+            end = matches[i + 1].start() if i + 1 < len(matches) else len(text)
+            raw.append((m.group(0).strip(), text[m.end():end].strip()))
+    else:
+        raw.append(("Document", text.strip()))
+
+    merged: List[Tuple[str, str]] = []
+    for title, body in raw:
+        if title.lower().lstrip("0123456789. ").startswith(STOP_SECTIONS):
+            break
+        if merged and len(body) < MIN_SECTION_CHARS:
+            prev_title, prev_body = merged[-1]
+            merged[-1] = (prev_title, f"{prev_body}\n\n{title}\n{body}".strip())
+        elif body:
+            merged.append((title, body))
+
+    splitter = RecursiveCharacterTextSplitter(chunk_size=MAX_SECTION_CHARS, chunk_overlap=0)
+    sections: List[Tuple[str, str]] = []
+    for title, body in merged:
+        if len(body) <= MAX_SECTION_CHARS:
+            sections.append((title, body))
+            continue
+        parts = splitter.split_text(body)
+        for n, part in enumerate(parts, start=1):
+            sections.append((f"{title} (part {n}/{len(parts)})", part))
+    return sections
+
+
+# ------------ CACHED LLM CALLS ------------
+def _llm_summarize(prompt: str) -> str:
+    llm = ChatGroq(
+        model=LLAMA_MODEL,
+        temperature=LLM_TEMPERATURE,
+        max_tokens=SUMMARY_MAX_TOKENS,
+        groq_api_key=GROQ_API_KEY
+    )
+    r = llm.invoke(prompt)
+    return r.content if hasattr(r, "content") else str(r)
+
+
+def _submit(prompt: str) -> Tuple[Future, bool]:
+    """
+    Submit a prompt to the shared pool, keyed by its content hash.
+    Returns (future, cached). Identical prompts already running are shared.
+    """
+    key = hashlib.sha256(f"{LLAMA_MODEL}\n{prompt}".encode("utf-8")).hexdigest()
+
+    with _cache_lock:
+        if key in _cache:
+            _cache.move_to_end(key)
+            done: Future = Future()
+            done.set_result(_cache[key])
+            return done, True
+        if key in _inflight:
+            return _inflight[key], False
+
+        fut = _llm_pool.submit(_llm_summarize, prompt)
+        _inflight[key] = fut
+
+    def _store(f: Future):
+        with _cache_lock:
+            _inflight.pop(key, None)
+            if f.exception() is None:
+                _cache[key] = f.result()
+                while len(_cache) > SUMMARY_CACHE_SIZE:
+                    _cache.popitem(last=False)
+
+    fut.add_done_callback(_store)
+    return fut, False
+
+
+def _map_prompt(title: str, body: str) -> str:
+    return f"""
+You are summarising one section of a research paper.
+
+Write a dense, factual summary (at most 150 words) of the section below.
+Keep key claims, methods, numbers and equations (in LaTeX). No preamble.
+
+--- SECTION: {title} ---
+{body}
+"""
+
+
+def _reduce_prompt(parts: List[str], final: bool) -> str:
+    joined = "\n\n".join(f"[{i}] {p}" for i, p in enumerate(parts, start=1))
+    target = (
+        "a complete, well-structured summary of the whole paper: problem, method, "
+        "key results and limitations (300-500 words)"
+        if final else
+        "one merged summary (at most 250 words) that keeps every key claim and number"
+    )
+    return f"""
+You are combining partial summaries of consecutive sections of one research paper.
+
+Write {target}. Use LaTeX for mathematics. No preamble.
+
+--- PARTIAL SUMMARIES ---
+{joined}
+"""
+
+
+# ------------ MAP-REDUCE PIPELINE ------------
+def summarize_document(text: str) -> Iterator[dict]:
+    """
+    Summarise a full document, yielding progress events as dicts:
+      {"event": "sections", ...}, {"event": "section", ...},
+      {"event": "reduce", ...}, {"event": "done", "summary": ...}
+    """
+    sections = split_sections(text)
+    if not sections:
+        yield {"event": "error", "message": "No summarisable text found."}
+        return
+
+    yield {"event": "sections", "total": len(sections), "titles": [t for t, _ in sections]}
+
+    # MAP (sections with identical prompts share one future)
+    waiting: Dict[Future, List[Tuple[int, str, bool]]] = {}
+    for i, (title, body) in enumerate(sections):
+        fut, cached = _submit(_map_prompt(title, body))
+        waiting.setdefault(fut, []).append((i, title, cached))
+
+    summaries: List[str] = [""] * len(sections)
+    done_count = 0
+    for fut in as_completed(waiting):
+        for i, title, cached in waiting[fut]:
+            summaries[i] = fut.result()
+            done_count += 1
+            yield {"event": "section", "index": i, "title": title, "cached": cached,
+                   "completed": done_count, "total": len(sections)}
+
+    # REDUCE (hierarchical, REDUCE_FANOUT summaries per call)
+    level = 0
+    while len(summaries) > 1 or level == 0:
+        level += 1
+        groups = [summaries[i:i + REDUCE_FANOUT] for i in range(0, len(summaries), REDUCE_FANOUT)]
+        final = len(groups) == 1
+        submitted = [_submit(_reduce_prompt(g, final)) for g in groups]
+        summaries = [fut.result() for fut, _ in submitted]
+        yield {"event": "reduce", "level": level, "inputs": sum(len(g) for g in groups),
+               "outputs": len(summaries), "cached": sum(1 for _, c in submitted if c)}
+
+    yield {"event": "done", "summary": summaries[0]}
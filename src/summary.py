@@ -1,7 +1,9 @@
 # src/summary.py
 import logging
 from langchain_groq import ChatGroq
+from typing import Optional
 from src.config import GROQ_API_KEY, LLAMA_MODEL
+from src.admission import Deadline
 
 logger = logging.getLogger(__name__)
 logging.basicConfig(level=logging.INFO)
@@ -47,7 +49,7 @@ def _format_papers_for_prompt(papers: list) -> str:
     return "\n".join(blocks)
 
 
-def answer_from_sources(query: str, context: str, papers: list) -> str:
+def answer_from_sources(query: str, context: str, papers: list, deadline: Optional[Deadline] = None) -> str:
     """
     Hybrid Research Assistant (Final Updated Version):
 
@@ -58,7 +60,13 @@ def answer_from_sources(query: str, context: str, papers: list) -> str:
           - Give a natural explanation first
           - Then list 5 related papers
     4) ALWAYS use clean LaTeX for all mathematical equations
+
+    With a deadline, the LLM call is skipped once it has passed and is
+    otherwise a single attempt bounded by the time that is left.
     """
+    timeout = deadline.budget("llm") if deadline else None
+    # each retry would get the full timeout again, overrunning the deadline
+    retries = {"max_retries": 0} if deadline else {}
 
     context = context or ""
     context_stripped = context.strip()
@@ -74,7 +82,9 @@ def answer_from_sources(query: str, context: str, papers: list) -> str:
         model=LLAMA_MODEL,
         temperature=0.0,
         max_tokens=1500,
-        groq_api_key=GROQ_API_KEY
+        groq_api_key=GROQ_API_KEY,
+        timeout=timeout,
+        **retries
     )
 
     # ------------------------------------------------
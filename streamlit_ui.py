@@ -79,7 +79,8 @@ if query:
     with st.spinner("Fetching answer from FastAPI backend..."):
         res = requests.post(
             f"{API_URL}/chat",
-            json={"question": query}
+            json={"question": query},
+            headers={"X-Request-Priority": "interactive"}
         )
 
     # --- START OF CORRECTION ---
@@ -89,6 +90,8 @@ if query:
     if res.status_code != 200:
         # Handle transport/HTTP error (e.g., 500 server crash, 404)
         error_msg = f"❌ HTTP Error {res.status_code}: Could not connect or server failed."
+        if res.status_code in (429, 503):
+            error_msg = f"⏳ Server busy (HTTP {res.status_code}). Retry in {res.headers.get('Retry-After', 'a few')} seconds."
         
         try:
             data = res.json()
@@ -0,0 +1,46 @@
+import random
+
+import numpy as np
+
+from src.dedup import CHUNK_DUP_THRESHOLD, SHINGLE_WORDS, minhash, normalize, similarity
+
+
+def _shingles(text):
+    words = normalize(text).split()
+    return {" ".join(words[i:i + SHINGLE_WORDS]) for i in range(len(words) - SHINGLE_WORDS + 1)}
+
+
+def _jaccard(a, b):
+    sa, sb = _shingles(a), _shingles(b)
+    return len(sa & sb) / len(sa | sb)
+
+
+def _pairs(n=300, words=200, seed=0):
+    """Text pairs that share a random-length run of words (true Jaccard spread over 0..1)."""
+    rng = random.Random(seed)
+    for _ in range(n):
+        shared = rng.randint(0, words)
+        common = [f"w{rng.randrange(10**6)}" for _ in range(shared)]
+        a = common + [f"a{rng.randrange(10**6)}" for _ in range(words - shared)]
+        b = common + [f"b{rng.randrange(10**6)}" for _ in range(words - shared)]
+        yield " ".join(a), " ".join(b)
+
+
+def test_similarity_tracks_true_jaccard():
+    errors = []
+    for a, b in _pairs():
+        errors.append(abs(similarity(minhash(a), minhash(b)) - _jaccard(a, b)))
+    # 64 permutations: standard error of the estimate is at most 1/16
+    assert np.mean(errors) < 0.06
+    assert max(errors) < 0.3
+
+
+def test_dissimilar_chunks_are_not_duplicates():
+    for a, b in _pairs(seed=1):
+        if _jaccard(a, b) < 0.5:
+            assert similarity(minhash(a), minhash(b)) < CHUNK_DUP_THRESHOLD
+
+
+def test_identical_text_matches_exactly():
+    text = " ".join(f"w{i}" for i in range(50))
+    assert similarity(minhash(text), minhash(text.upper())) == 1.0